@@ -460,6 +460,7 @@ async def update_admin_config(
         current_config.error_ban_threshold = request.error_ban_threshold
 
         await db.update_admin_config(current_config)
+        token_manager.invalidate_admin_config_cache()
         return {"success": True, "message": "Configuration updated"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -668,6 +669,7 @@ async def activate_sora2(
                 total_count=sora2_info.get("total_count", 0),
                 remaining_count=sora2_remaining_count
             )
+            token_manager.invalidate_active_tokens_cache()
 
             return {
                 "success": True,
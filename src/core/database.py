@@ -741,12 +741,15 @@ class Database:
                 """, (today, token_id))
             await db.commit()
     
-    async def increment_error_count(self, token_id: int, increment_consecutive: bool = True):
+    async def increment_error_count(self, token_id: int, increment_consecutive: bool = True) -> Optional[int]:
         """Increment error count
 
         Args:
             token_id: Token ID
             increment_consecutive: Whether to increment consecutive error count (False for overload errors)
+
+        Returns:
+            Consecutive error count after the update, or None if the token has no stats row
         """
         from datetime import date
         async with aiosqlite.connect(self.db_path) as db:
@@ -758,7 +761,7 @@ class Database:
             # If date changed, reset today's error count
             if row and row[0] != today:
                 if increment_consecutive:
-                    await db.execute("""
+                    cursor = await db.execute("""
                         UPDATE token_stats
                         SET error_count = error_count + 1,
                             consecutive_error_count = consecutive_error_count + 1,
@@ -766,20 +769,22 @@ class Database:
                             today_date = ?,
                             last_error_at = CURRENT_TIMESTAMP
                         WHERE token_id = ?
+                        RETURNING consecutive_error_count
                     """, (today, token_id))
                 else:
-                    await db.execute("""
+                    cursor = await db.execute("""
                         UPDATE token_stats
                         SET error_count = error_count + 1,
                             today_error_count = 1,
                             today_date = ?,
                             last_error_at = CURRENT_TIMESTAMP
                         WHERE token_id = ?
+                        RETURNING consecutive_error_count
                     """, (today, token_id))
             else:
                 # Same day, just increment counters
                 if increment_consecutive:
-                    await db.execute("""
+                    cursor = await db.execute("""
                         UPDATE token_stats
                         SET error_count = error_count + 1,
                             consecutive_error_count = consecutive_error_count + 1,
@@ -787,17 +792,21 @@ class Database:
                             today_date = ?,
                             last_error_at = CURRENT_TIMESTAMP
                         WHERE token_id = ?
+                        RETURNING consecutive_error_count
                     """, (today, token_id))
                 else:
-                    await db.execute("""
+                    cursor = await db.execute("""
                         UPDATE token_stats
                         SET error_count = error_count + 1,
                             today_error_count = today_error_count + 1,
                             today_date = ?,
                             last_error_at = CURRENT_TIMESTAMP
                         WHERE token_id = ?
+                        RETURNING consecutive_error_count
                     """, (today, token_id))
+            row = await cursor.fetchone()
             await db.commit()
+            return row[0] if row else None
     
     async def reset_error_count(self, token_id: int):
         """Reset consecutive error count (keep total error_count)"""
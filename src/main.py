@@ -36,8 +36,8 @@ app.add_middleware(
 
 # Initialize components
 db = Database()
-token_manager = TokenManager(db)
 proxy_manager = ProxyManager(db)
+token_manager = TokenManager(db, proxy_manager)
 concurrency_manager = ConcurrencyManager()
 load_balancer = LoadBalancer(token_manager, concurrency_manager)
 sora_client = SoraClient(proxy_manager)
@@ -145,6 +145,7 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     await generation_handler.file_cache.stop_cleanup_task()
+    await token_manager.aclose()
 
 if __name__ == "__main__":
     uvicorn.run(
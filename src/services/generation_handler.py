@@ -303,6 +303,10 @@ class GenerationHandler:
         task_id = None
         is_first_chunk = True  # Track if this is the first chunk
 
+        # Track in-flight load for token selection (released in finally)
+        load_handle = self.token_manager.begin_request(token_obj.id, "image" if is_image else "video")
+        request_ok = None
+
         try:
             # Upload image if provided
             media_id = None
@@ -392,6 +396,7 @@ class GenerationHandler:
             
             # Record success
             await self.token_manager.record_success(token_obj.id, is_video=is_video)
+            request_ok = True
 
             # Release lock for image generation
             if is_image:
@@ -450,6 +455,7 @@ class GenerationHandler:
                 error_str = str(e).lower()
                 is_overload = "heavy_load" in error_str or "under heavy load" in error_str
                 await self.token_manager.record_error(token_obj.id, is_overload=is_overload)
+            request_ok = False
 
             # Log failed request
             duration = time.time() - start_time
@@ -462,6 +468,8 @@ class GenerationHandler:
                 duration
             )
             raise e
+        finally:
+            self.token_manager.end_request(load_handle, request_ok)
     
     async def _poll_task_result(self, task_id: str, token: str, is_video: bool,
                                 stream: bool, prompt: str, token_id: int = None) -> AsyncGenerator[str, None]:
@@ -1155,6 +1163,10 @@ class GenerationHandler:
         if not token_obj:
             raise Exception("No available tokens for video generation")
 
+        # Track in-flight load for token selection (released in finally)
+        load_handle = self.token_manager.begin_request(token_obj.id, "video")
+        request_ok = None
+
         character_id = None
         try:
             yield self._format_stream_chunk(
@@ -1272,6 +1284,7 @@ class GenerationHandler:
 
             # Record success
             await self.token_manager.record_success(token_obj.id, is_video=True)
+            request_ok = True
 
         except Exception as e:
             # Record error (check if it's an overload error)
@@ -1279,6 +1292,7 @@ class GenerationHandler:
                 error_str = str(e).lower()
                 is_overload = "heavy_load" in error_str or "under heavy load" in error_str
                 await self.token_manager.record_error(token_obj.id, is_overload=is_overload)
+            request_ok = False
             debug_logger.log_error(
                 error_message=f"Character and video generation failed: {str(e)}",
                 status_code=500,
@@ -1286,6 +1300,8 @@ class GenerationHandler:
             )
             raise
         finally:
+            self.token_manager.end_request(load_handle, request_ok)
+
             # Step 7: Delete character
             if character_id:
                 try:
@@ -1315,6 +1331,10 @@ class GenerationHandler:
         if not token_obj:
             raise Exception("No available tokens for remix generation")
 
+        # Track in-flight load for token selection (released in finally)
+        load_handle = self.token_manager.begin_request(token_obj.id, "video")
+        request_ok = None
+
         task_id = None
         try:
             yield self._format_stream_chunk(
@@ -1361,6 +1381,7 @@ class GenerationHandler:
 
             # Record success
             await self.token_manager.record_success(token_obj.id, is_video=True)
+            request_ok = True
 
         except Exception as e:
             # Record error (check if it's an overload error)
@@ -1368,12 +1389,15 @@ class GenerationHandler:
                 error_str = str(e).lower()
                 is_overload = "heavy_load" in error_str or "under heavy load" in error_str
                 await self.token_manager.record_error(token_obj.id, is_overload=is_overload)
+            request_ok = False
             debug_logger.log_error(
                 error_message=f"Remix generation failed: {str(e)}",
                 status_code=500,
                 response_text=str(e)
             )
             raise
+        finally:
+            self.token_manager.end_request(load_handle, request_ok)
 
     async def _poll_cameo_status(self, cameo_id: str, token: str, timeout: int = 600, poll_interval: int = 5) -> Dict[str, Any]:
         """Poll for cameo (character) processing status
@@ -1,6 +1,7 @@
 """Load balancing module"""
 import random
-from typing import Optional
+from datetime import datetime
+from typing import Optional, List
 from ..core.models import Token
 from ..core.config import config
 from .token_manager import TokenManager
@@ -9,7 +10,7 @@ from .concurrency_manager import ConcurrencyManager
 from ..core.logger import debug_logger
 
 class LoadBalancer:
-    """Token load balancer with random selection and image generation lock"""
+    """Token load balancer with load-aware selection and image generation lock"""
 
     def __init__(self, token_manager: TokenManager, concurrency_manager: Optional[ConcurrencyManager] = None):
         self.token_manager = token_manager
@@ -17,9 +18,49 @@ class LoadBalancer:
         # Use image timeout from config as lock timeout
         self.token_lock = TokenLock(lock_timeout=config.image_timeout)
 
+    def _score(self, token: Token, kind: str, default_latency: float) -> float:
+        """Lower is better: the kind's latency weighted by in-flight requests and failure rate"""
+        stats = self.token_manager.get_runtime_stats(token.id)
+        if not stats:
+            return default_latency
+        latency = stats["latency"][kind]
+        if latency is None:
+            latency = default_latency
+        return latency * (1 + stats["inflight"]) * (1 + stats["fail"])
+
+    def _pick(self, tokens: List[Token], kind: str) -> Token:
+        """Pick a token using power-of-two-choices on load score
+
+        Args:
+            tokens: Candidate tokens
+            kind: Job kind ("image" or "video") whose latency is compared
+
+        Falls back to uniform random selection until any latency has been
+        observed for this kind (cold start).
+        """
+        # Common single-token deployment: nothing to choose between
+        if len(tokens) == 1:
+            return tokens[0]
+
+        latencies = []
+        for token in tokens:
+            stats = self.token_manager.get_runtime_stats(token.id)
+            if stats and stats["latency"][kind] is not None:
+                latencies.append(stats["latency"][kind])
+
+        if not latencies:
+            return random.choice(tokens)
+
+        # Tokens without history are scored as average, so they still get picked
+        default_latency = sum(latencies) / len(latencies)
+        first, second = random.sample(tokens, 2)
+        if self._score(second, kind, default_latency) < self._score(first, kind, default_latency):
+            return second
+        return first
+
     async def select_token(self, for_image_generation: bool = False, for_video_generation: bool = False) -> Optional[Token]:
         """
-        Select a token using random load balancing
+        Select a token using load-aware (power-of-two-choices) load balancing
 
         Args:
             for_image_generation: If True, only select tokens that are not locked for image generation and have image_enabled=True
@@ -37,7 +78,6 @@ class LoadBalancer:
             refresh_count = 0
             for token in all_tokens:
                 if token.is_active and token.expiry_time:
-                    from datetime import datetime
                     time_until_expiry = token.expiry_time - datetime.now()
                     hours_until_expiry = time_until_expiry.total_seconds() / 3600
                     # Refresh if expiry is within 24 hours
@@ -58,7 +98,6 @@ class LoadBalancer:
 
         # If for video generation, filter out tokens with Sora2 quota exhausted and tokens without Sora2 support
         if for_video_generation:
-            from datetime import datetime
             available_tokens = []
             for token in active_tokens:
                 # Skip tokens that don't have video enabled
@@ -89,23 +128,26 @@ class LoadBalancer:
 
         # If for image generation, filter out locked tokens and tokens without image enabled
         if for_image_generation:
+            # Skip tokens that don't have image enabled
+            image_tokens = [token for token in active_tokens if token.image_enabled]
+
+            # Check all locks in a single call instead of one by one
+            locked = await self.token_lock.is_locked_many([token.id for token in image_tokens])
+
             available_tokens = []
-            for token in active_tokens:
-                # Skip tokens that don't have image enabled
-                if not token.image_enabled:
+            for token in image_tokens:
+                if token.id in locked:
                     continue
-
-                if not await self.token_lock.is_locked(token.id):
-                    # Check concurrency limit if concurrency manager is available
-                    if self.concurrency_manager and not await self.concurrency_manager.can_use_image(token.id):
-                        continue
-                    available_tokens.append(token)
+                # Check concurrency limit if concurrency manager is available
+                if self.concurrency_manager and not await self.concurrency_manager.can_use_image(token.id):
+                    continue
+                available_tokens.append(token)
 
             if not available_tokens:
                 return None
 
-            # Random selection from available tokens
-            return random.choice(available_tokens)
+            # Load-aware selection from available tokens
+            return self._pick(available_tokens, "image")
         else:
             # For video generation, check concurrency limit
             if for_video_generation and self.concurrency_manager:
@@ -115,7 +157,7 @@ class LoadBalancer:
                         available_tokens.append(token)
                 if not available_tokens:
                     return None
-                return random.choice(available_tokens)
+                return self._pick(available_tokens, "video")
             else:
                 # For video generation without concurrency manager, no additional filtering
-                return random.choice(active_tokens)
+                return self._pick(active_tokens, "video")
@@ -1,24 +1,46 @@
 """Proxy management module"""
+import asyncio
+import time
 from typing import Optional
 from ..core.database import Database
 from ..core.models import ProxyConfig
 
 class ProxyManager:
     """Proxy configuration manager"""
+
+    # How long a resolved proxy URL is reused before hitting the database again
+    PROXY_URL_CACHE_TTL = 2  # seconds
     
     def __init__(self, db: Database):
         self.db = db
+        self._proxy_url: Optional[str] = None
+        self._proxy_url_expires_at: float = 0.0
+        self._lock = asyncio.Lock()  # Protect cached proxy URL refresh
     
     async def get_proxy_url(self) -> Optional[str]:
         """Get proxy URL if enabled, otherwise return None"""
-        config = await self.db.get_proxy_config()
-        if config.proxy_enabled and config.proxy_url:
-            return config.proxy_url
-        return None
+        if time.time() < self._proxy_url_expires_at:
+            return self._proxy_url
+
+        async with self._lock:
+            # Another caller may have refreshed while we waited
+            if time.time() < self._proxy_url_expires_at:
+                return self._proxy_url
+
+            config = await self.db.get_proxy_config()
+            if config.proxy_enabled and config.proxy_url:
+                self._proxy_url = config.proxy_url
+            else:
+                self._proxy_url = None
+            self._proxy_url_expires_at = time.time() + self.PROXY_URL_CACHE_TTL
+            return self._proxy_url
     
     async def update_proxy_config(self, enabled: bool, proxy_url: Optional[str]):
         """Update proxy configuration"""
         await self.db.update_proxy_config(enabled, proxy_url)
+        # Drop cached proxy URL so the new config takes effect immediately for
+        # every component sharing this instance (others pick it up within the TTL)
+        self._proxy_url_expires_at = 0.0
     
     async def get_proxy_config(self) -> ProxyConfig:
         """Get proxy configuration"""
@@ -1,7 +1,7 @@
 """Token lock manager for image generation"""
 import asyncio
 import time
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional, Set
 from ..core.logger import debug_logger
 
 
@@ -89,6 +89,35 @@ class TokenLock:
             
             return True
     
+    async def is_locked_many(self, token_ids: Iterable[int]) -> Set[int]:
+        """
+        Check lock state for several tokens at once
+        
+        Args:
+            token_ids: Token IDs to check
+            
+        Returns:
+            Set of token IDs that are currently locked
+        """
+        async with self._lock:
+            current_time = time.time()
+            locked = set()
+            
+            for token_id in token_ids:
+                lock_time = self._locks.get(token_id)
+                if lock_time is None:
+                    continue
+                
+                # Check if expired
+                if current_time - lock_time > self.lock_timeout:
+                    # Expired, remove lock
+                    del self._locks[token_id]
+                    continue
+                
+                locked.add(token_id)
+            
+            return locked
+    
     async def cleanup_expired_locks(self):
         """Clean up expired locks"""
         async with self._lock:
@@ -1,34 +1,206 @@
 """Token management module"""
-import jwt
 import asyncio
+import base64
+import hashlib
 import random
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+import orjson
+from curl_cffi import CurlOpt
 from curl_cffi.requests import AsyncSession
+from dateutil import parser as date_parser
 from faker import Faker
 from ..core.database import Database
-from ..core.models import Token, TokenStats
+from ..core.models import Token, TokenStats, AdminConfig
 from ..core.config import config
 from .proxy_manager import ProxyManager
 from ..core.logger import debug_logger
 
+# JWT claim holding the OpenAI profile (email etc.)
+_OPENAI_PROFILE_KEY = "https://api.openai.com/profile"
+
+# Static request settings shared by all Sora / OpenAI API helpers.
+# Only per-call values (Authorization, cookies, proxy) are added at call time.
+_REQUEST_TIMEOUT = 30
+_ACCEPT_JSON_HEADERS = {"Accept": "application/json"}
+_SORA_WEB_HEADERS = {
+    "Accept": "application/json",
+    "Origin": "https://sora.chatgpt.com",
+    "Referer": "https://sora.chatgpt.com/"
+}
+_JSON_BODY_HEADERS = {"Content-Type": "application/json"}
+_OAUTH_HEADERS = {
+    "Accept": "application/json",
+    "Content-Type": "application/json"
+}
+
 class TokenManager:
     """Token lifecycle manager"""
 
-    def __init__(self, db: Database):
+    # Max concurrent requests on the shared HTTP session
+    SESSION_MAX_CLIENTS = 20
+
+    # Decoded JWT claims cache settings
+    JWT_CACHE_MAXSIZE = 4096
+    JWT_CACHE_TTL = 5  # seconds
+
+    # Subscription / Sora2 invite info cache settings
+    ENRICHMENT_CACHE_MAXSIZE = 1024
+    ENRICHMENT_CACHE_TTL = 300  # seconds
+
+    # Upper bound on active token list staleness (covers time-based expiry/cooldown
+    # and writes made outside this TokenManager)
+    ACTIVE_TOKENS_CACHE_TTL = 1  # seconds
+
+    # How long admin config (error ban threshold) is reused before re-reading it
+    ADMIN_CONFIG_CACHE_TTL = 30  # seconds
+
+    # Smoothing factor for per-token latency / failure EWMAs
+    STATS_EWMA_ALPHA = 0.3
+
+    def __init__(self, db: Database, proxy_manager: Optional[ProxyManager] = None):
         self.db = db
         self._lock = asyncio.Lock()
-        self.proxy_manager = ProxyManager(db)
+        # Share the app's ProxyManager so proxy config updates invalidate its cache here too
+        self.proxy_manager = proxy_manager or ProxyManager(db)
         self.fake = Faker()
-    
-    async def decode_jwt(self, token: str) -> dict:
-        """Decode JWT token without verification"""
+        self._jwt_cache: Dict[bytes, Tuple[float, dict]] = {}  # token_hash -> (expires_at, claims)
+        self._session: Optional[AsyncSession] = None
+        self._enrichment_cache: Dict[Tuple[str, bytes], Tuple[float, dict]] = {}  # (kind, token_hash) -> (expires_at, info)
+        self._active_cache: Optional[List[Token]] = None
+        self._admin_cfg: Optional[AdminConfig] = None
+        self._admin_cfg_ts: float = 0.0
+        self._active_cache_expires_at: float = 0.0
+        self._active_version: int = 0  # Bumped by every write that may change the active set
+        # token_id -> {"latency": {"image"|"video": ewma seconds}, "inflight": int, "fail": ewma 0..1}
+        self._runtime_stats: Dict[int, Dict[str, Any]] = {}
+
+    async def _get_session(self) -> AsyncSession:
+        """Get the shared HTTP session, creating it on first use
+
+        Reusing one session keeps TLS connections to sora.chatgpt.com alive
+        across API calls instead of handshaking for every request. The chrome
+        impersonation negotiates HTTP/2 via ALPN, and PIPEWAIT makes requests
+        started together on a cold pool (e.g. the gathered enrichment lookups
+        in add_token) wait for the first connection and multiplex over it
+        instead of each opening their own. Requests through different proxies
+        still use separate connections.
+
+        The session is shared by every account, so response cookies are never
+        stored on it (discard_cookies); callers pass the cookies they need per
+        request. Flows that rely on cookies carrying over between requests use
+        a private session instead.
+        """
+        if self._session is None:
+            # 自动生成 User-Agent 和浏览器指纹
+            self._session = AsyncSession(
+                impersonate="chrome",
+                max_clients=self.SESSION_MAX_CLIENTS,
+                discard_cookies=True,
+                curl_options={CurlOpt.PIPEWAIT: 1}
+            )
+        return self._session
+
+    async def aclose(self):
+        """Close the shared HTTP session"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @staticmethod
+    def _token_hash(token: str) -> bytes:
+        """Cheap fixed-size cache key for a token string"""
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def decode_jwt(self, token: str) -> dict:
+        """Decode JWT token without verification
+
+        Decoded claims are cached for a short TTL (never past the token's exp)
+        so repeated add/update calls for the same token skip re-parsing.
+        """
+        token_hash = self._token_hash(token)
+        now = time.time()
+
+        cached = self._jwt_cache.get(token_hash)
+        if cached:
+            expires_at, decoded = cached
+            if expires_at > now:
+                return decoded
+            del self._jwt_cache[token_hash]
+
         try:
-            decoded = jwt.decode(token, options={"verify_signature": False})
-            return decoded
+            # Signatures are never verified here, so parse the payload segment directly
+            _, payload_b64, _ = token.split(".", 2)
+            padding = "=" * (-len(payload_b64) % 4)
+            decoded = orjson.loads(base64.urlsafe_b64decode(payload_b64 + padding))
         except Exception as e:
             raise ValueError(f"Invalid JWT token: {str(e)}")
 
+        if not isinstance(decoded, dict):
+            raise ValueError("Invalid JWT token: payload is not a JSON object")
+
+        ttl = self.JWT_CACHE_TTL
+        exp = decoded.get("exp")
+        if isinstance(exp, (int, float)):
+            ttl = min(ttl, exp - now)
+
+        if ttl > 0:
+            # Evict the oldest entry when the cache is full
+            if len(self._jwt_cache) >= self.JWT_CACHE_MAXSIZE:
+                self._jwt_cache.pop(next(iter(self._jwt_cache)))
+            self._jwt_cache[token_hash] = (now + ttl, decoded)
+
+        return decoded
+
+    def decode_jwt_exp(self, token: str) -> Optional[int]:
+        """Get the raw POSIX ``exp`` claim of a JWT token (None if absent)
+
+        Callers that only need to compare expiry should use this and build a
+        datetime only when persisting.
+        """
+        exp = self.decode_jwt(token).get("exp")
+        return int(exp) if exp is not None else None
+
+    @staticmethod
+    def _extract_email(decoded: dict) -> Optional[str]:
+        """Get the email from decoded OpenAI JWT claims (None if absent)"""
+        return decoded.get(_OPENAI_PROFILE_KEY, {}).get("email")
+
+    def _enrichment_cache_get(self, kind: str, token: str) -> Optional[dict]:
+        """Get cached subscription / Sora2 info for a token, if still fresh"""
+        key = (kind, self._token_hash(token))
+        cached = self._enrichment_cache.get(key)
+        if not cached:
+            return None
+        expires_at, info = cached
+        if expires_at <= time.time():
+            del self._enrichment_cache[key]
+            return None
+        return dict(info)
+
+    def _enrichment_cache_set(self, kind: str, token: str, info: dict):
+        """Cache subscription / Sora2 info for a token"""
+        if len(self._enrichment_cache) >= self.ENRICHMENT_CACHE_MAXSIZE:
+            self._enrichment_cache.pop(next(iter(self._enrichment_cache)))
+        self._enrichment_cache[(kind, self._token_hash(token))] = (time.time() + self.ENRICHMENT_CACHE_TTL, dict(info))
+
+    def invalidate_enrichment_cache(self, token: str):
+        """Drop cached subscription / Sora2 info for a token"""
+        token_hash = self._token_hash(token)
+        for kind in ("subscription", "sora2_invite"):
+            self._enrichment_cache.pop((kind, token_hash), None)
+
+    @staticmethod
+    def _parse_datetime(value: str) -> datetime:
+        """Parse an ISO-8601 timestamp from the Sora API (e.g. 2025-11-13T16:58:21Z)"""
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            # Not plain ISO-8601, fall back to the lenient parser
+            return date_parser.parse(value)
+
     def _generate_random_username(self) -> str:
         """Generate a random username using faker
 
@@ -63,35 +235,30 @@ class TokenManager:
         """Get user info from Sora API"""
         proxy_url = await self.proxy_manager.get_proxy_url()
 
-        async with AsyncSession() as session:
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/json",
-                "Origin": "https://sora.chatgpt.com",
-                "Referer": "https://sora.chatgpt.com/"
-            }
+        session = await self._get_session()
 
-            kwargs = {
-                "headers": headers,
-                "timeout": 30,
-                "impersonate": "chrome"  # 自动生成 User-Agent 和浏览器指纹
-            }
+        headers = {**_SORA_WEB_HEADERS, "Authorization": f"Bearer {access_token}"}
 
-            if proxy_url:
-                kwargs["proxy"] = proxy_url
+        kwargs = {
+            "headers": headers,
+            "timeout": _REQUEST_TIMEOUT
+        }
 
-            response = await session.get(
-                f"{config.sora_base_url}/me",
-                **kwargs
-            )
+        if proxy_url:
+            kwargs["proxy"] = proxy_url
 
-            if response.status_code != 200:
-                raise ValueError(f"Failed to get user info: {response.status_code}")
+        response = await session.get(
+            f"{config.sora_base_url}/me",
+            **kwargs
+        )
+
+        if response.status_code != 200:
+            raise ValueError(f"Failed to get user info: {response.status_code}")
 
-            return response.json()
+        return orjson.loads(response.content)
 
     async def get_subscription_info(self, token: str) -> Dict[str, Any]:
-        """Get subscription information from Sora API
+        """Get subscription information from Sora API (cached for ENRICHMENT_CACHE_TTL)
 
         Returns:
             {
@@ -100,169 +267,198 @@ class TokenManager:
                 "subscription_end": "2025-11-13T16:58:21Z"
             }
         """
-        print(f"🔍 开始获取订阅信息...")
+        cached = self._enrichment_cache_get("subscription", token)
+        if cached is not None:
+            return cached
+
+        result = await self._fetch_subscription_info(token)
+        self._enrichment_cache_set("subscription", token, result)
+        return result
+
+    async def _fetch_subscription_info(self, token: str) -> Dict[str, Any]:
+        """Fetch subscription information from Sora API"""
+        debug_logger.log_info(f"[SUBSCRIPTION] 🔍 开始获取订阅信息...")
         proxy_url = await self.proxy_manager.get_proxy_url()
 
         headers = {
             "Authorization": f"Bearer {token}"
         }
 
-        async with AsyncSession() as session:
-            url = "https://sora.chatgpt.com/backend/billing/subscriptions"
-            print(f"📡 请求 URL: {url}")
-            print(f"🔑 使用 Token: {token[:30]}...")
+        session = await self._get_session()
 
-            kwargs = {
-                "headers": headers,
-                "timeout": 30,
-                "impersonate": "chrome"  # 自动生成 User-Agent 和浏览器指纹
-            }
+        url = "https://sora.chatgpt.com/backend/billing/subscriptions"
+        debug_logger.log_info(f"[SUBSCRIPTION] 📡 请求 URL: {url}")
+        debug_logger.log_info(f"[SUBSCRIPTION] 🔑 使用 Token: {token[:30]}...")
+
+        kwargs = {
+            "headers": headers,
+            "timeout": _REQUEST_TIMEOUT
+        }
 
-            if proxy_url:
-                kwargs["proxy"] = proxy_url
-                print(f"🌐 使用代理: {proxy_url}")
+        if proxy_url:
+            kwargs["proxy"] = proxy_url
+            debug_logger.log_info(f"[SUBSCRIPTION] 🌐 使用代理: {proxy_url}")
 
-            response = await session.get(url, **kwargs)
-            print(f"📥 响应状态码: {response.status_code}")
-
-            if response.status_code == 200:
-                data = response.json()
-                print(f"📦 响应数据: {data}")
-
-                # 提取第一个订阅信息
-                if data.get("data") and len(data["data"]) > 0:
-                    subscription = data["data"][0]
-                    plan = subscription.get("plan", {})
-
-                    result = {
-                        "plan_type": plan.get("id", ""),
-                        "plan_title": plan.get("title", ""),
-                        "subscription_end": subscription.get("end_ts", "")
-                    }
-                    print(f"✅ 订阅信息提取成功: {result}")
-                    return result
-
-                print(f"⚠️  响应数据中没有订阅信息")
-                return {
-                    "plan_type": "",
-                    "plan_title": "",
-                    "subscription_end": ""
+        response = await session.get(url, **kwargs)
+        debug_logger.log_info(f"[SUBSCRIPTION] 📥 响应状态码: {response.status_code}")
+
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            if config.debug_enabled:
+                debug_logger.log_info(f"[SUBSCRIPTION] 📦 响应数据: {data}")
+
+            # 提取第一个订阅信息
+            if data.get("data") and len(data["data"]) > 0:
+                subscription = data["data"][0]
+                plan = subscription.get("plan", {})
+
+                result = {
+                    "plan_type": plan.get("id", ""),
+                    "plan_title": plan.get("title", ""),
+                    "subscription_end": subscription.get("end_ts", "")
                 }
-            else:
-                print(f"❌ Failed to get subscription info: {response.status_code}")
-                print(f"📄 响应内容: {response.text}")
+                if config.debug_enabled:
+                    debug_logger.log_info(f"[SUBSCRIPTION] ✅ 订阅信息提取成功: {result}")
+                return result
 
-                # Check for token_expired error
-                try:
-                    error_data = response.json()
-                    error_info = error_data.get("error", {})
-                    if error_info.get("code") == "token_expired":
-                        raise Exception(f"Token已过期: {error_info.get('message', 'Token expired')}")
-                except ValueError:
-                    pass
+            debug_logger.log_info(f"[SUBSCRIPTION] ⚠️  响应数据中没有订阅信息")
+            return {
+                "plan_type": "",
+                "plan_title": "",
+                "subscription_end": ""
+            }
+        else:
+            debug_logger.log_info(f"[SUBSCRIPTION] ❌ Failed to get subscription info: {response.status_code}")
+            if config.debug_enabled:
+                debug_logger.log_info(f"[SUBSCRIPTION] 📄 响应内容: {response.text}")
+
+            # Check for token_expired error
+            try:
+                error_data = orjson.loads(response.content)
+                error_info = error_data.get("error", {})
+                if error_info.get("code") == "token_expired":
+                    raise Exception(f"Token已过期: {error_info.get('message', 'Token expired')}")
+            except ValueError:
+                pass
 
-                raise Exception(f"Failed to get subscription info: {response.status_code}")
+            raise Exception(f"Failed to get subscription info: {response.status_code}")
 
     async def get_sora2_invite_code(self, access_token: str) -> dict:
-        """Get Sora2 invite code"""
+        """Get Sora2 invite code (supported results are cached for ENRICHMENT_CACHE_TTL)"""
+        cached = self._enrichment_cache_get("sora2_invite", access_token)
+        if cached is not None:
+            return cached
+
+        result = await self._fetch_sora2_invite_code(access_token)
+        # Only cache positive results; failures may be transient
+        if result.get("supported"):
+            self._enrichment_cache_set("sora2_invite", access_token, result)
+        return result
+
+    async def _fetch_sora2_invite_code(self, access_token: str) -> dict:
+        """Fetch Sora2 invite code from Sora API"""
         proxy_url = await self.proxy_manager.get_proxy_url()
 
-        print(f"🔍 开始获取Sora2邀请码...")
+        debug_logger.log_info(f"[SORA2_INVITE] 🔍 开始获取Sora2邀请码...")
 
-        async with AsyncSession() as session:
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/json"
-            }
-
-            kwargs = {
-                "headers": headers,
-                "timeout": 30,
-                "impersonate": "chrome"  # 自动生成 User-Agent 和浏览器指纹
-            }
+        session = await self._get_session()
 
-            if proxy_url:
-                kwargs["proxy"] = proxy_url
-                print(f"🌐 使用代理: {proxy_url}")
+        headers = {**_ACCEPT_JSON_HEADERS, "Authorization": f"Bearer {access_token}"}
 
-            response = await session.get(
-                "https://sora.chatgpt.com/backend/project_y/invite/mine",
-                **kwargs
-            )
+        kwargs = {
+            "headers": headers,
+            "timeout": _REQUEST_TIMEOUT
+        }
 
-            print(f"📥 响应状态码: {response.status_code}")
+        if proxy_url:
+            kwargs["proxy"] = proxy_url
+            debug_logger.log_info(f"[SORA2_INVITE] 🌐 使用代理: {proxy_url}")
 
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ Sora2邀请码获取成功: {data}")
-                return {
-                    "supported": True,
-                    "invite_code": data.get("invite_code"),
-                    "redeemed_count": data.get("redeemed_count", 0),
-                    "total_count": data.get("total_count", 0)
-                }
-            else:
-                print(f"❌ 获取Sora2邀请码失败: {response.status_code}")
-                print(f"📄 响应内容: {response.text}")
+        response = await session.get(
+            "https://sora.chatgpt.com/backend/project_y/invite/mine",
+            **kwargs
+        )
 
-                # Check for specific errors
-                try:
-                    error_data = response.json()
-                    error_info = error_data.get("error", {})
+        debug_logger.log_info(f"[SORA2_INVITE] 📥 响应状态码: {response.status_code}")
 
-                    # Check for unsupported_country_code
-                    if error_info.get("code") == "unsupported_country_code":
-                        country = error_info.get("param", "未知")
-                        raise Exception(f"Sora在您的国家/地区不可用 ({country}): {error_info.get('message', '')}")
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            if config.debug_enabled:
+                debug_logger.log_info(f"[SORA2_INVITE] ✅ Sora2邀请码获取成功: {data}")
+            return {
+                "supported": True,
+                "invite_code": data.get("invite_code"),
+                "redeemed_count": data.get("redeemed_count", 0),
+                "total_count": data.get("total_count", 0)
+            }
+        else:
+            debug_logger.log_info(f"[SORA2_INVITE] ❌ 获取Sora2邀请码失败: {response.status_code}")
+            if config.debug_enabled:
+                debug_logger.log_info(f"[SORA2_INVITE] 📄 响应内容: {response.text}")
 
-                    # Check if it's 401 unauthorized (token doesn't support Sora2)
-                    if response.status_code == 401 and "Unauthorized" in error_info.get("message", ""):
-                        print(f"⚠️  Token不支持Sora2，尝试激活...")
+            # 401 means the token doesn't support Sora2 yet; the status code is enough,
+            # no need to parse the error body
+            if response.status_code == 401:
+                debug_logger.log_info(f"[SORA2_INVITE] ⚠️  Token不支持Sora2，尝试激活...")
 
-                        # Try to activate Sora2
-                        try:
-                            activate_response = await session.get(
-                                "https://sora.chatgpt.com/backend/m/bootstrap",
+                # Try to activate Sora2
+                try:
+                    # Bootstrap sets cookies the retry depends on, so run this flow on a
+                    # private session seeded with the cookies from the failed request
+                    async with AsyncSession(impersonate="chrome", cookies=response.cookies) as flow_session:
+                        activate_response = await flow_session.get(
+                            "https://sora.chatgpt.com/backend/m/bootstrap",
+                            **kwargs
+                        )
+
+                        if activate_response.status_code == 200:
+                            debug_logger.log_info(f"[SORA2_INVITE] ✅ Sora2激活请求成功，重新获取邀请码...")
+
+                            # Retry getting invite code
+                            retry_response = await flow_session.get(
+                                "https://sora.chatgpt.com/backend/project_y/invite/mine",
                                 **kwargs
                             )
 
-                            if activate_response.status_code == 200:
-                                print(f"✅ Sora2激活请求成功，重新获取邀请码...")
-
-                                # Retry getting invite code
-                                retry_response = await session.get(
-                                    "https://sora.chatgpt.com/backend/project_y/invite/mine",
-                                    **kwargs
-                                )
-
-                                if retry_response.status_code == 200:
-                                    retry_data = retry_response.json()
-                                    print(f"✅ Sora2激活成功！邀请码: {retry_data}")
-                                    return {
-                                        "supported": True,
-                                        "invite_code": retry_data.get("invite_code"),
-                                        "redeemed_count": retry_data.get("redeemed_count", 0),
-                                        "total_count": retry_data.get("total_count", 0)
-                                    }
-                                else:
-                                    print(f"⚠️  激活后仍无法获取邀请码: {retry_response.status_code}")
+                            if retry_response.status_code == 200:
+                                retry_data = orjson.loads(retry_response.content)
+                                if config.debug_enabled:
+                                    debug_logger.log_info(f"[SORA2_INVITE] ✅ Sora2激活成功！邀请码: {retry_data}")
+                                return {
+                                    "supported": True,
+                                    "invite_code": retry_data.get("invite_code"),
+                                    "redeemed_count": retry_data.get("redeemed_count", 0),
+                                    "total_count": retry_data.get("total_count", 0)
+                                }
                             else:
-                                print(f"⚠️  Sora2激活失败: {activate_response.status_code}")
-                        except Exception as activate_e:
-                            print(f"⚠️  Sora2激活过程出错: {activate_e}")
-
-                        return {
-                            "supported": False,
-                            "invite_code": None
-                        }
-                except ValueError:
-                    pass
+                                debug_logger.log_info(f"[SORA2_INVITE] ⚠️  激活后仍无法获取邀请码: {retry_response.status_code}")
+                        else:
+                            debug_logger.log_info(f"[SORA2_INVITE] ⚠️  Sora2激活失败: {activate_response.status_code}")
+                except Exception as activate_e:
+                    debug_logger.log_info(f"[SORA2_INVITE] ⚠️  Sora2激活过程出错: {activate_e}")
 
                 return {
                     "supported": False,
                     "invite_code": None
                 }
 
+            # Check for specific errors
+            try:
+                error_data = orjson.loads(response.content)
+                error_info = error_data.get("error", {})
+
+                # Check for unsupported_country_code
+                if error_info.get("code") == "unsupported_country_code":
+                    country = error_info.get("param", "未知")
+                    raise Exception(f"Sora在您的国家/地区不可用 ({country}): {error_info.get('message', '')}")
+            except ValueError:
+                pass
+
+            return {
+                "supported": False,
+                "invite_code": None
+            }
+
     async def get_sora2_remaining_count(self, access_token: str) -> dict:
         """Get Sora2 remaining video count
 
@@ -275,50 +471,49 @@ class TokenManager:
         """
         proxy_url = await self.proxy_manager.get_proxy_url()
 
-        print(f"🔍 开始获取Sora2剩余次数...")
+        debug_logger.log_info(f"[SORA2_REMAINING] 🔍 开始获取Sora2剩余次数...")
 
-        async with AsyncSession() as session:
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/json"
-            }
+        session = await self._get_session()
 
-            kwargs = {
-                "headers": headers,
-                "timeout": 30,
-                "impersonate": "chrome"  # 自动生成 User-Agent 和浏览器指纹
-            }
+        headers = {**_ACCEPT_JSON_HEADERS, "Authorization": f"Bearer {access_token}"}
 
-            if proxy_url:
-                kwargs["proxy"] = proxy_url
-                print(f"🌐 使用代理: {proxy_url}")
+        kwargs = {
+            "headers": headers,
+            "timeout": _REQUEST_TIMEOUT
+        }
 
-            response = await session.get(
-                "https://sora.chatgpt.com/backend/nf/check",
-                **kwargs
-            )
+        if proxy_url:
+            kwargs["proxy"] = proxy_url
+            debug_logger.log_info(f"[SORA2_REMAINING] 🌐 使用代理: {proxy_url}")
 
-            print(f"📥 响应状态码: {response.status_code}")
+        response = await session.get(
+            "https://sora.chatgpt.com/backend/nf/check",
+            **kwargs
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ Sora2剩余次数获取成功: {data}")
+        debug_logger.log_info(f"[SORA2_REMAINING] 📥 响应状态码: {response.status_code}")
 
-                rate_limit_info = data.get("rate_limit_and_credit_balance", {})
-                return {
-                    "success": True,
-                    "remaining_count": rate_limit_info.get("estimated_num_videos_remaining", 0),
-                    "rate_limit_reached": rate_limit_info.get("rate_limit_reached", False),
-                    "access_resets_in_seconds": rate_limit_info.get("access_resets_in_seconds", 0)
-                }
-            else:
-                print(f"❌ 获取Sora2剩余次数失败: {response.status_code}")
-                print(f"📄 响应内容: {response.text[:500]}")
-                return {
-                    "success": False,
-                    "remaining_count": 0,
-                    "error": f"Failed to get remaining count: {response.status_code}"
-                }
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            if config.debug_enabled:
+                debug_logger.log_info(f"[SORA2_REMAINING] ✅ Sora2剩余次数获取成功: {data}")
+
+            rate_limit_info = data.get("rate_limit_and_credit_balance", {})
+            return {
+                "success": True,
+                "remaining_count": rate_limit_info.get("estimated_num_videos_remaining", 0),
+                "rate_limit_reached": rate_limit_info.get("rate_limit_reached", False),
+                "access_resets_in_seconds": rate_limit_info.get("access_resets_in_seconds", 0)
+            }
+        else:
+            debug_logger.log_info(f"[SORA2_REMAINING] ❌ 获取Sora2剩余次数失败: {response.status_code}")
+            if config.debug_enabled:
+                debug_logger.log_info(f"[SORA2_REMAINING] 📄 响应内容: {response.text[:500]}")
+            return {
+                "success": False,
+                "remaining_count": 0,
+                "error": f"Failed to get remaining count: {response.status_code}"
+            }
 
     async def check_username_available(self, access_token: str, username: str) -> bool:
         """Check if username is available
@@ -332,41 +527,39 @@ class TokenManager:
         """
         proxy_url = await self.proxy_manager.get_proxy_url()
 
-        print(f"🔍 检查用户名是否可用: {username}")
+        debug_logger.log_info(f"[USERNAME_CHECK] 🔍 检查用户名是否可用: {username}")
 
-        async with AsyncSession() as session:
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
+        session = await self._get_session()
 
-            kwargs = {
-                "headers": headers,
-                "json": {"username": username},
-                "timeout": 30,
-                "impersonate": "chrome"
-            }
+        headers = {**_JSON_BODY_HEADERS, "Authorization": f"Bearer {access_token}"}
 
-            if proxy_url:
-                kwargs["proxy"] = proxy_url
-                print(f"🌐 使用代理: {proxy_url}")
+        kwargs = {
+            "headers": headers,
+            "json": {"username": username},
+            "timeout": _REQUEST_TIMEOUT
+        }
 
-            response = await session.post(
-                "https://sora.chatgpt.com/backend/project_y/profile/username/check",
-                **kwargs
-            )
+        if proxy_url:
+            kwargs["proxy"] = proxy_url
+            debug_logger.log_info(f"[USERNAME_CHECK] 🌐 使用代理: {proxy_url}")
 
-            print(f"📥 响应状态码: {response.status_code}")
+        response = await session.post(
+            "https://sora.chatgpt.com/backend/project_y/profile/username/check",
+            **kwargs
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                available = data.get("available", False)
-                print(f"✅ 用户名检查结果: available={available}")
-                return available
-            else:
-                print(f"❌ 用户名检查失败: {response.status_code}")
-                print(f"📄 响应内容: {response.text[:500]}")
-                return False
+        debug_logger.log_info(f"[USERNAME_CHECK] 📥 响应状态码: {response.status_code}")
+
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            available = data.get("available", False)
+            debug_logger.log_info(f"[USERNAME_CHECK] ✅ 用户名检查结果: available={available}")
+            return available
+        else:
+            debug_logger.log_info(f"[USERNAME_CHECK] ❌ 用户名检查失败: {response.status_code}")
+            if config.debug_enabled:
+                debug_logger.log_info(f"[USERNAME_CHECK] 📄 响应内容: {response.text[:500]}")
+            return False
 
     async def set_username(self, access_token: str, username: str) -> dict:
         """Set username for the account
@@ -380,171 +573,168 @@ class TokenManager:
         """
         proxy_url = await self.proxy_manager.get_proxy_url()
 
-        print(f"🔍 开始设置用户名: {username}")
+        debug_logger.log_info(f"[USERNAME_SET] 🔍 开始设置用户名: {username}")
 
-        async with AsyncSession() as session:
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
+        session = await self._get_session()
 
-            kwargs = {
-                "headers": headers,
-                "json": {"username": username},
-                "timeout": 30,
-                "impersonate": "chrome"
-            }
+        headers = {**_JSON_BODY_HEADERS, "Authorization": f"Bearer {access_token}"}
 
-            if proxy_url:
-                kwargs["proxy"] = proxy_url
-                print(f"🌐 使用代理: {proxy_url}")
+        kwargs = {
+            "headers": headers,
+            "json": {"username": username},
+            "timeout": _REQUEST_TIMEOUT
+        }
 
-            response = await session.post(
-                "https://sora.chatgpt.com/backend/project_y/profile/username/set",
-                **kwargs
-            )
+        if proxy_url:
+            kwargs["proxy"] = proxy_url
+            debug_logger.log_info(f"[USERNAME_SET] 🌐 使用代理: {proxy_url}")
 
-            print(f"📥 响应状态码: {response.status_code}")
+        response = await session.post(
+            "https://sora.chatgpt.com/backend/project_y/profile/username/set",
+            **kwargs
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ 用户名设置成功: {data.get('username')}")
-                return data
-            else:
-                print(f"❌ 用户名设置失败: {response.status_code}")
-                print(f"📄 响应内容: {response.text[:500]}")
-                raise Exception(f"Failed to set username: {response.status_code}")
+        debug_logger.log_info(f"[USERNAME_SET] 📥 响应状态码: {response.status_code}")
+
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            debug_logger.log_info(f"[USERNAME_SET] ✅ 用户名设置成功: {data.get('username')}")
+            return data
+        else:
+            debug_logger.log_info(f"[USERNAME_SET] ❌ 用户名设置失败: {response.status_code}")
+            if config.debug_enabled:
+                debug_logger.log_info(f"[USERNAME_SET] 📄 响应内容: {response.text[:500]}")
+            raise Exception(f"Failed to set username: {response.status_code}")
 
     async def activate_sora2_invite(self, access_token: str, invite_code: str) -> dict:
         """Activate Sora2 with invite code"""
-        import uuid
         proxy_url = await self.proxy_manager.get_proxy_url()
 
-        print(f"🔍 开始激活Sora2邀请码: {invite_code}")
-        print(f"🔑 Access Token 前缀: {access_token[:50]}...")
+        debug_logger.log_info(f"[SORA2_ACTIVATE] 🔍 开始激活Sora2邀请码: {invite_code}")
+        debug_logger.log_info(f"[SORA2_ACTIVATE] 🔑 Access Token 前缀: {access_token[:50]}...")
 
-        async with AsyncSession() as session:
-            # 生成设备ID
-            device_id = str(uuid.uuid4())
+        session = await self._get_session()
 
-            # 只设置必要的头，让 impersonate 处理其他
-            headers = {
-                "authorization": f"Bearer {access_token}",
-                "cookie": f"oai-did={device_id}"
-            }
+        # 生成设备ID
+        device_id = str(uuid.uuid4())
 
-            print(f"🆔 设备ID: {device_id}")
-            print(f"📦 请求体: {{'invite_code': '{invite_code}'}}")
+        # 只设置必要的头，让 impersonate 处理其他
+        headers = {
+            "authorization": f"Bearer {access_token}",
+            "cookie": f"oai-did={device_id}"
+        }
 
-            kwargs = {
-                "headers": headers,
-                "json": {"invite_code": invite_code},
-                "timeout": 30,
-                "impersonate": "chrome120"  # 使用 chrome120 让库自动处理 UA 等头
-            }
+        debug_logger.log_info(f"[SORA2_ACTIVATE] 🆔 设备ID: {device_id}")
+        debug_logger.log_info(f"[SORA2_ACTIVATE] 📦 请求体: {{'invite_code': '{invite_code}'}}")
 
-            if proxy_url:
-                kwargs["proxy"] = proxy_url
-                print(f"🌐 使用代理: {proxy_url}")
+        kwargs = {
+            "headers": headers,
+            "json": {"invite_code": invite_code},
+            "timeout": _REQUEST_TIMEOUT,
+            "impersonate": "chrome120"  # 使用 chrome120 让库自动处理 UA 等头
+        }
 
-            response = await session.post(
-                "https://sora.chatgpt.com/backend/project_y/invite/accept",
-                **kwargs
-            )
+        if proxy_url:
+            kwargs["proxy"] = proxy_url
+            debug_logger.log_info(f"[SORA2_ACTIVATE] 🌐 使用代理: {proxy_url}")
 
-            print(f"📥 响应状态码: {response.status_code}")
+        response = await session.post(
+            "https://sora.chatgpt.com/backend/project_y/invite/accept",
+            **kwargs
+        )
 
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ Sora2激活成功: {data}")
-                return {
-                    "success": data.get("success", False),
-                    "already_accepted": data.get("already_accepted", False)
-                }
-            else:
-                print(f"❌ Sora2激活失败: {response.status_code}")
-                print(f"📄 响应内容: {response.text[:500]}")
-                raise Exception(f"Failed to activate Sora2: {response.status_code}")
+        debug_logger.log_info(f"[SORA2_ACTIVATE] 📥 响应状态码: {response.status_code}")
+
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            if config.debug_enabled:
+                debug_logger.log_info(f"[SORA2_ACTIVATE] ✅ Sora2激活成功: {data}")
+            # Invite state changed, drop cached Sora2 info
+            self.invalidate_enrichment_cache(access_token)
+            return {
+                "success": data.get("success", False),
+                "already_accepted": data.get("already_accepted", False)
+            }
+        else:
+            debug_logger.log_info(f"[SORA2_ACTIVATE] ❌ Sora2激活失败: {response.status_code}")
+            if config.debug_enabled:
+                debug_logger.log_info(f"[SORA2_ACTIVATE] 📄 响应内容: {response.text[:500]}")
+            raise Exception(f"Failed to activate Sora2: {response.status_code}")
 
     async def st_to_at(self, session_token: str) -> dict:
         """Convert Session Token to Access Token"""
         debug_logger.log_info(f"[ST_TO_AT] 开始转换 Session Token 为 Access Token...")
         proxy_url = await self.proxy_manager.get_proxy_url()
 
-        async with AsyncSession() as session:
-            headers = {
-                "Cookie": f"__Secure-next-auth.session-token={session_token}",
-                "Accept": "application/json",
-                "Origin": "https://sora.chatgpt.com",
-                "Referer": "https://sora.chatgpt.com/"
-            }
+        session = await self._get_session()
 
-            kwargs = {
-                "headers": headers,
-                "timeout": 30,
-                "impersonate": "chrome"  # 自动生成 User-Agent 和浏览器指纹
-            }
+        headers = {**_SORA_WEB_HEADERS, "Cookie": f"__Secure-next-auth.session-token={session_token}"}
 
-            if proxy_url:
-                kwargs["proxy"] = proxy_url
-                debug_logger.log_info(f"[ST_TO_AT] 使用代理: {proxy_url}")
+        kwargs = {
+            "headers": headers,
+            "timeout": _REQUEST_TIMEOUT
+        }
 
-            url = "https://sora.chatgpt.com/api/auth/session"
-            debug_logger.log_info(f"[ST_TO_AT] 📡 请求 URL: {url}")
+        if proxy_url:
+            kwargs["proxy"] = proxy_url
+            debug_logger.log_info(f"[ST_TO_AT] 使用代理: {proxy_url}")
 
-            try:
-                response = await session.get(url, **kwargs)
-                debug_logger.log_info(f"[ST_TO_AT] 📥 响应状态码: {response.status_code}")
+        url = "https://sora.chatgpt.com/api/auth/session"
+        debug_logger.log_info(f"[ST_TO_AT] 📡 请求 URL: {url}")
 
-                if response.status_code != 200:
-                    error_msg = f"Failed to convert ST to AT: {response.status_code}"
-                    debug_logger.log_info(f"[ST_TO_AT] ❌ {error_msg}")
-                    debug_logger.log_info(f"[ST_TO_AT] 响应内容: {response.text[:500]}")
-                    raise ValueError(error_msg)
+        try:
+            response = await session.get(url, **kwargs)
+            debug_logger.log_info(f"[ST_TO_AT] 📥 响应状态码: {response.status_code}")
 
-                # 获取响应文本用于调试
-                response_text = response.text
-                debug_logger.log_info(f"[ST_TO_AT] 📄 响应内容: {response_text[:500]}")
+            if response.status_code != 200:
+                error_msg = f"Failed to convert ST to AT: {response.status_code}"
+                debug_logger.log_info(f"[ST_TO_AT] ❌ {error_msg}")
+                debug_logger.log_info(f"[ST_TO_AT] 响应内容: {response.text[:500]}")
+                raise ValueError(error_msg)
 
-                # 检查响应是否为空
-                if not response_text or response_text.strip() == "":
-                    debug_logger.log_info(f"[ST_TO_AT] ❌ 响应体为空")
-                    raise ValueError("Response body is empty")
+            # 获取响应文本用于调试
+            response_text = response.text
+            debug_logger.log_info(f"[ST_TO_AT] 📄 响应内容: {response_text[:500]}")
 
-                try:
-                    data = response.json()
-                except Exception as json_err:
-                    debug_logger.log_info(f"[ST_TO_AT] ❌ JSON解析失败: {str(json_err)}")
-                    debug_logger.log_info(f"[ST_TO_AT] 原始响应: {response_text[:1000]}")
-                    raise ValueError(f"Failed to parse JSON response: {str(json_err)}")
-
-                # 检查data是否为None
-                if data is None:
-                    debug_logger.log_info(f"[ST_TO_AT] ❌ 响应JSON为空")
-                    raise ValueError("Response JSON is empty")
-
-                access_token = data.get("accessToken")
-                email = data.get("user", {}).get("email") if data.get("user") else None
-                expires = data.get("expires")
-
-                # 检查必要字段
-                if not access_token:
-                    debug_logger.log_info(f"[ST_TO_AT] ❌ 响应中缺少 accessToken 字段")
-                    debug_logger.log_info(f"[ST_TO_AT] 响应数据: {data}")
-                    raise ValueError("Missing accessToken in response")
-
-                debug_logger.log_info(f"[ST_TO_AT] ✅ ST 转换成功")
-                debug_logger.log_info(f"  - Email: {email}")
-                debug_logger.log_info(f"  - 过期时间: {expires}")
+            # 检查响应是否为空
+            if not response_text or response_text.strip() == "":
+                debug_logger.log_info(f"[ST_TO_AT] ❌ 响应体为空")
+                raise ValueError("Response body is empty")
 
-                return {
-                    "access_token": access_token,
-                    "email": email,
-                    "expires": expires
-                }
-            except Exception as e:
-                debug_logger.log_info(f"[ST_TO_AT] 🔴 异常: {str(e)}")
-                raise
+            try:
+                data = orjson.loads(response.content)
+            except Exception as json_err:
+                debug_logger.log_info(f"[ST_TO_AT] ❌ JSON解析失败: {str(json_err)}")
+                debug_logger.log_info(f"[ST_TO_AT] 原始响应: {response_text[:1000]}")
+                raise ValueError(f"Failed to parse JSON response: {str(json_err)}")
+
+            # 检查data是否为None
+            if data is None:
+                debug_logger.log_info(f"[ST_TO_AT] ❌ 响应JSON为空")
+                raise ValueError("Response JSON is empty")
+
+            access_token = data.get("accessToken")
+            email = data.get("user", {}).get("email") if data.get("user") else None
+            expires = data.get("expires")
+
+            # 检查必要字段
+            if not access_token:
+                debug_logger.log_info(f"[ST_TO_AT] ❌ 响应中缺少 accessToken 字段")
+                debug_logger.log_info(f"[ST_TO_AT] 响应数据: {data}")
+                raise ValueError("Missing accessToken in response")
+
+            debug_logger.log_info(f"[ST_TO_AT] ✅ ST 转换成功")
+            debug_logger.log_info(f"  - Email: {email}")
+            debug_logger.log_info(f"  - 过期时间: {expires}")
+
+            return {
+                "access_token": access_token,
+                "email": email,
+                "expires": expires
+            }
+        except Exception as e:
+            debug_logger.log_info(f"[ST_TO_AT] 🔴 异常: {str(e)}")
+            raise
     
     async def rt_to_at(self, refresh_token: str, client_id: Optional[str] = None) -> dict:
         """Convert Refresh Token to Access Token
@@ -560,85 +750,95 @@ class TokenManager:
         debug_logger.log_info(f"[RT_TO_AT] 使用 Client ID: {effective_client_id[:20]}...")
         proxy_url = await self.proxy_manager.get_proxy_url()
 
-        async with AsyncSession() as session:
-            headers = {
-                "Accept": "application/json",
-                "Content-Type": "application/json"
-            }
-
-            kwargs = {
-                "headers": headers,
-                "json": {
-                    "client_id": effective_client_id,
-                    "grant_type": "refresh_token",
-                    "redirect_uri": "com.openai.chat://auth0.openai.com/ios/com.openai.chat/callback",
-                    "refresh_token": refresh_token
-                },
-                "timeout": 30,
-                "impersonate": "chrome"  # 自动生成 User-Agent 和浏览器指纹
-            }
+        session = await self._get_session()
+
+        kwargs = {
+            "headers": _OAUTH_HEADERS,
+            "json": {
+                "client_id": effective_client_id,
+                "grant_type": "refresh_token",
+                "redirect_uri": "com.openai.chat://auth0.openai.com/ios/com.openai.chat/callback",
+                "refresh_token": refresh_token
+            },
+            "timeout": _REQUEST_TIMEOUT
+        }
 
-            if proxy_url:
-                kwargs["proxy"] = proxy_url
-                debug_logger.log_info(f"[RT_TO_AT] 使用代理: {proxy_url}")
+        if proxy_url:
+            kwargs["proxy"] = proxy_url
+            debug_logger.log_info(f"[RT_TO_AT] 使用代理: {proxy_url}")
 
-            url = "https://auth.openai.com/oauth/token"
-            debug_logger.log_info(f"[RT_TO_AT] 📡 请求 URL: {url}")
+        url = "https://auth.openai.com/oauth/token"
+        debug_logger.log_info(f"[RT_TO_AT] 📡 请求 URL: {url}")
 
-            try:
-                response = await session.post(url, **kwargs)
-                debug_logger.log_info(f"[RT_TO_AT] 📥 响应状态码: {response.status_code}")
+        try:
+            response = await session.post(url, **kwargs)
+            debug_logger.log_info(f"[RT_TO_AT] 📥 响应状态码: {response.status_code}")
 
-                if response.status_code != 200:
-                    error_msg = f"Failed to convert RT to AT: {response.status_code}"
-                    debug_logger.log_info(f"[RT_TO_AT] ❌ {error_msg}")
-                    debug_logger.log_info(f"[RT_TO_AT] 响应内容: {response.text[:500]}")
-                    raise ValueError(f"{error_msg} - {response.text}")
+            if response.status_code != 200:
+                error_msg = f"Failed to convert RT to AT: {response.status_code}"
+                debug_logger.log_info(f"[RT_TO_AT] ❌ {error_msg}")
+                debug_logger.log_info(f"[RT_TO_AT] 响应内容: {response.text[:500]}")
+                raise ValueError(f"{error_msg} - {response.text}")
 
-                # 获取响应文本用于调试
-                response_text = response.text
-                debug_logger.log_info(f"[RT_TO_AT] 📄 响应内容: {response_text[:500]}")
+            # 获取响应文本用于调试
+            response_text = response.text
+            debug_logger.log_info(f"[RT_TO_AT] 📄 响应内容: {response_text[:500]}")
 
-                # 检查响应是否为空
-                if not response_text or response_text.strip() == "":
-                    debug_logger.log_info(f"[RT_TO_AT] ❌ 响应体为空")
-                    raise ValueError("Response body is empty")
+            # 检查响应是否为空
+            if not response_text or response_text.strip() == "":
+                debug_logger.log_info(f"[RT_TO_AT] ❌ 响应体为空")
+                raise ValueError("Response body is empty")
 
-                try:
-                    data = response.json()
-                except Exception as json_err:
-                    debug_logger.log_info(f"[RT_TO_AT] ❌ JSON解析失败: {str(json_err)}")
-                    debug_logger.log_info(f"[RT_TO_AT] 原始响应: {response_text[:1000]}")
-                    raise ValueError(f"Failed to parse JSON response: {str(json_err)}")
-
-                # 检查data是否为None
-                if data is None:
-                    debug_logger.log_info(f"[RT_TO_AT] ❌ 响应JSON为空")
-                    raise ValueError("Response JSON is empty")
-
-                access_token = data.get("access_token")
-                new_refresh_token = data.get("refresh_token")
-                expires_in = data.get("expires_in")
-
-                # 检查必要字段
-                if not access_token:
-                    debug_logger.log_info(f"[RT_TO_AT] ❌ 响应中缺少 access_token 字段")
-                    debug_logger.log_info(f"[RT_TO_AT] 响应数据: {data}")
-                    raise ValueError("Missing access_token in response")
-
-                debug_logger.log_info(f"[RT_TO_AT] ✅ RT 转换成功")
-                debug_logger.log_info(f"  - 新 Access Token 有效期: {expires_in} 秒")
-                debug_logger.log_info(f"  - Refresh Token 已更新: {'是' if new_refresh_token else '否'}")
+            try:
+                data = orjson.loads(response.content)
+            except Exception as json_err:
+                debug_logger.log_info(f"[RT_TO_AT] ❌ JSON解析失败: {str(json_err)}")
+                debug_logger.log_info(f"[RT_TO_AT] 原始响应: {response_text[:1000]}")
+                raise ValueError(f"Failed to parse JSON response: {str(json_err)}")
+
+            # 检查data是否为None
+            if data is None:
+                debug_logger.log_info(f"[RT_TO_AT] ❌ 响应JSON为空")
+                raise ValueError("Response JSON is empty")
+
+            access_token = data.get("access_token")
+            new_refresh_token = data.get("refresh_token")
+            expires_in = data.get("expires_in")
+
+            # 检查必要字段
+            if not access_token:
+                debug_logger.log_info(f"[RT_TO_AT] ❌ 响应中缺少 access_token 字段")
+                debug_logger.log_info(f"[RT_TO_AT] 响应数据: {data}")
+                raise ValueError("Missing access_token in response")
+
+            debug_logger.log_info(f"[RT_TO_AT] ✅ RT 转换成功")
+            debug_logger.log_info(f"  - 新 Access Token 有效期: {expires_in} 秒")
+            debug_logger.log_info(f"  - Refresh Token 已更新: {'是' if new_refresh_token else '否'}")
 
-                return {
-                    "access_token": access_token,
-                    "refresh_token": new_refresh_token,
-                    "expires_in": expires_in
-                }
-            except Exception as e:
-                debug_logger.log_info(f"[RT_TO_AT] 🔴 异常: {str(e)}")
-                raise
+            return {
+                "access_token": access_token,
+                "refresh_token": new_refresh_token,
+                "expires_in": expires_in
+            }
+        except Exception as e:
+            debug_logger.log_info(f"[RT_TO_AT] 🔴 异常: {str(e)}")
+            raise
     
+    @staticmethod
+    def _is_stored_info_current(existing_token: Token) -> bool:
+        """Check if stored account info can be reused instead of fetching it again
+
+        existing_token was looked up by the exact token value, so its JWT (and
+        expiry) is unchanged by construction; the only thing that can go stale
+        is the subscription, so reuse the stored info while it hasn't ended.
+        """
+        subscription_end = existing_token.subscription_end
+        if not subscription_end:
+            return False
+
+        now = datetime.now(subscription_end.tzinfo) if subscription_end.tzinfo else datetime.now()
+        return subscription_end > now
+
     async def add_token(self, token_value: str,
                        st: Optional[str] = None,
                        rt: Optional[str] = None,
@@ -674,49 +874,59 @@ class TokenManager:
         if existing_token:
             if not update_if_exists:
                 raise ValueError(f"Token 已存在（邮箱: {existing_token.email}）。如需更新，请先删除旧 Token 或使用更新功能。")
+            # Skip re-fetching account info if nothing meaningful changed
+            if self._is_stored_info_current(existing_token):
+                await self.db.update_token(existing_token.id, st=st, rt=rt, remark=remark)
+                self.invalidate_active_tokens_cache()
+                return await self.db.get_token(existing_token.id)
             # Update existing token
             return await self.update_existing_token(existing_token.id, token_value, st, rt, remark)
 
         # Decode JWT to get expiry time and email
-        decoded = await self.decode_jwt(token_value)
+        decoded = self.decode_jwt(token_value)
 
         # Extract expiry time from JWT
         expiry_time = datetime.fromtimestamp(decoded.get("exp", 0)) if "exp" in decoded else None
 
         # Extract email from JWT (OpenAI JWT format)
-        jwt_email = None
-        if "https://api.openai.com/profile" in decoded:
-            jwt_email = decoded["https://api.openai.com/profile"].get("email")
+        jwt_email = self._extract_email(decoded)
+
+        # Fetch user, subscription and Sora2 info from Sora API concurrently
+        user_res, sub_res, sora2_res = await asyncio.gather(
+            self.get_user_info(token_value),
+            self.get_subscription_info(token_value),
+            self.get_sora2_invite_code(token_value),
+            return_exceptions=True
+        )
 
         # Get user info from Sora API
-        try:
-            user_info = await self.get_user_info(token_value)
-            email = user_info.get("email", jwt_email or "")
-            name = user_info.get("name") or ""
-        except Exception as e:
+        if isinstance(user_res, Exception):
             # If API call fails, use JWT data
             email = jwt_email or ""
             name = email.split("@")[0] if email else ""
+        else:
+            email = user_res.get("email", jwt_email or "")
+            name = user_res.get("name") or ""
 
         # Get subscription info from Sora API
         plan_type = None
         plan_title = None
         subscription_end = None
-        try:
-            sub_info = await self.get_subscription_info(token_value)
-            plan_type = sub_info.get("plan_type")
-            plan_title = sub_info.get("plan_title")
-            # Parse subscription end time
-            if sub_info.get("subscription_end"):
-                from dateutil import parser
-                subscription_end = parser.parse(sub_info["subscription_end"])
-        except Exception as e:
-            error_msg = str(e)
+        if isinstance(sub_res, Exception):
             # Re-raise if it's a critical error (token expired)
-            if "Token已过期" in error_msg:
-                raise
+            if "Token已过期" in str(sub_res):
+                raise sub_res
             # If API call fails, subscription info will be None
-            print(f"Failed to get subscription info: {e}")
+            debug_logger.log_info(f"[ADD_TOKEN] Failed to get subscription info: {sub_res}")
+        else:
+            try:
+                plan_type = sub_res.get("plan_type")
+                plan_title = sub_res.get("plan_title")
+                # Parse subscription end time
+                if sub_res.get("subscription_end"):
+                    subscription_end = self._parse_datetime(sub_res["subscription_end"])
+            except Exception as e:
+                debug_logger.log_info(f"[ADD_TOKEN] Failed to get subscription info: {e}")
 
         # Get Sora2 invite code
         sora2_supported = None
@@ -724,12 +934,17 @@ class TokenManager:
         sora2_redeemed_count = 0
         sora2_total_count = 0
         sora2_remaining_count = 0
-        try:
-            sora2_info = await self.get_sora2_invite_code(token_value)
-            sora2_supported = sora2_info.get("supported", False)
-            sora2_invite_code = sora2_info.get("invite_code")
-            sora2_redeemed_count = sora2_info.get("redeemed_count", 0)
-            sora2_total_count = sora2_info.get("total_count", 0)
+        if isinstance(sora2_res, Exception):
+            # Re-raise if it's a critical error (unsupported country)
+            if "Sora在您的国家/地区不可用" in str(sora2_res):
+                raise sora2_res
+            # If API call fails, Sora2 info will be None
+            debug_logger.log_info(f"[ADD_TOKEN] Failed to get Sora2 info: {sora2_res}")
+        else:
+            sora2_supported = sora2_res.get("supported", False)
+            sora2_invite_code = sora2_res.get("invite_code")
+            sora2_redeemed_count = sora2_res.get("redeemed_count", 0)
+            sora2_total_count = sora2_res.get("total_count", 0)
 
             # If Sora2 is supported, get remaining count
             if sora2_supported:
@@ -737,16 +952,9 @@ class TokenManager:
                     remaining_info = await self.get_sora2_remaining_count(token_value)
                     if remaining_info.get("success"):
                         sora2_remaining_count = remaining_info.get("remaining_count", 0)
-                        print(f"✅ Sora2剩余次数: {sora2_remaining_count}")
+                        debug_logger.log_info(f"[ADD_TOKEN] ✅ Sora2剩余次数: {sora2_remaining_count}")
                 except Exception as e:
-                    print(f"Failed to get Sora2 remaining count: {e}")
-        except Exception as e:
-            error_msg = str(e)
-            # Re-raise if it's a critical error (unsupported country)
-            if "Sora在您的国家/地区不可用" in error_msg:
-                raise
-            # If API call fails, Sora2 info will be None
-            print(f"Failed to get Sora2 info: {e}")
+                    debug_logger.log_info(f"[ADD_TOKEN] Failed to get Sora2 remaining count: {e}")
 
         # Check and set username if needed
         try:
@@ -756,33 +964,33 @@ class TokenManager:
 
             # If username is null, need to set one
             if username is None:
-                print(f"⚠️  检测到用户名为null，需要设置用户名")
+                debug_logger.log_info(f"[ADD_TOKEN] ⚠️  检测到用户名为null，需要设置用户名")
 
                 # Generate random username
                 max_attempts = 5
                 for attempt in range(max_attempts):
                     generated_username = self._generate_random_username()
-                    print(f"🔄 尝试用户名 ({attempt + 1}/{max_attempts}): {generated_username}")
+                    debug_logger.log_info(f"[ADD_TOKEN] 🔄 尝试用户名 ({attempt + 1}/{max_attempts}): {generated_username}")
 
                     # Check if username is available
                     if await self.check_username_available(token_value, generated_username):
                         # Set the username
                         try:
                             await self.set_username(token_value, generated_username)
-                            print(f"✅ 用户名设置成功: {generated_username}")
+                            debug_logger.log_info(f"[ADD_TOKEN] ✅ 用户名设置成功: {generated_username}")
                             break
                         except Exception as e:
-                            print(f"❌ 用户名设置失败: {e}")
+                            debug_logger.log_info(f"[ADD_TOKEN] ❌ 用户名设置失败: {e}")
                             if attempt == max_attempts - 1:
-                                print(f"⚠️  达到最大尝试次数，跳过用户名设置")
+                                debug_logger.log_info(f"[ADD_TOKEN] ⚠️  达到最大尝试次数，跳过用户名设置")
                     else:
-                        print(f"⚠️  用户名 {generated_username} 已被占用，尝试下一个")
+                        debug_logger.log_info(f"[ADD_TOKEN] ⚠️  用户名 {generated_username} 已被占用，尝试下一个")
                         if attempt == max_attempts - 1:
-                            print(f"⚠️  达到最大尝试次数，跳过用户名设置")
+                            debug_logger.log_info(f"[ADD_TOKEN] ⚠️  达到最大尝试次数，跳过用户名设置")
             else:
-                print(f"✅ 用户名已设置: {username}")
+                debug_logger.log_info(f"[ADD_TOKEN] ✅ 用户名已设置: {username}")
         except Exception as e:
-            print(f"⚠️  用户名检查/设置过程中出错: {e}")
+            debug_logger.log_info(f"[ADD_TOKEN] ⚠️  用户名检查/设置过程中出错: {e}")
 
         # Create token object
         token = Token(
@@ -811,6 +1019,7 @@ class TokenManager:
 
         # Save to database
         token_id = await self.db.add_token(token)
+        self.invalidate_active_tokens_cache()
         token.id = token_id
 
         return token
@@ -821,35 +1030,40 @@ class TokenManager:
                                     remark: Optional[str] = None) -> Token:
         """Update an existing token with new information"""
         # Decode JWT to get expiry time
-        decoded = await self.decode_jwt(token_value)
+        decoded = self.decode_jwt(token_value)
         expiry_time = datetime.fromtimestamp(decoded.get("exp", 0)) if "exp" in decoded else None
 
-        # Get user info from Sora API
-        jwt_email = None
-        if "https://api.openai.com/profile" in decoded:
-            jwt_email = decoded["https://api.openai.com/profile"].get("email")
+        # Extract email from JWT (OpenAI JWT format)
+        jwt_email = self._extract_email(decoded)
 
-        try:
-            user_info = await self.get_user_info(token_value)
-            email = user_info.get("email", jwt_email or "")
-            name = user_info.get("name", "")
-        except Exception as e:
+        # Fetch user and subscription info from Sora API concurrently
+        user_res, sub_res = await asyncio.gather(
+            self.get_user_info(token_value),
+            self.get_subscription_info(token_value),
+            return_exceptions=True
+        )
+
+        if isinstance(user_res, Exception):
             email = jwt_email or ""
             name = email.split("@")[0] if email else ""
+        else:
+            email = user_res.get("email", jwt_email or "")
+            name = user_res.get("name", "")
 
         # Get subscription info from Sora API
         plan_type = None
         plan_title = None
         subscription_end = None
-        try:
-            sub_info = await self.get_subscription_info(token_value)
-            plan_type = sub_info.get("plan_type")
-            plan_title = sub_info.get("plan_title")
-            if sub_info.get("subscription_end"):
-                from dateutil import parser
-                subscription_end = parser.parse(sub_info["subscription_end"])
-        except Exception as e:
-            print(f"Failed to get subscription info: {e}")
+        if isinstance(sub_res, Exception):
+            debug_logger.log_info(f"[UPDATE_TOKEN] Failed to get subscription info: {sub_res}")
+        else:
+            try:
+                plan_type = sub_res.get("plan_type")
+                plan_title = sub_res.get("plan_title")
+                if sub_res.get("subscription_end"):
+                    subscription_end = self._parse_datetime(sub_res["subscription_end"])
+            except Exception as e:
+                debug_logger.log_info(f"[UPDATE_TOKEN] Failed to get subscription info: {e}")
 
         # Update token in database
         await self.db.update_token(
@@ -863,6 +1077,7 @@ class TokenManager:
             plan_title=plan_title,
             subscription_end=subscription_end
         )
+        self.invalidate_active_tokens_cache()
 
         # Get updated token
         updated_token = await self.db.get_token(token_id)
@@ -871,6 +1086,7 @@ class TokenManager:
     async def delete_token(self, token_id: int):
         """Delete a token"""
         await self.db.delete_token(token_id)
+        self.invalidate_active_tokens_cache()
 
     async def update_token(self, token_id: int,
                           token: Optional[str] = None,
@@ -887,18 +1103,33 @@ class TokenManager:
         expiry_time = None
         if token:
             try:
-                decoded = await self.decode_jwt(token)
-                expiry_time = datetime.fromtimestamp(decoded.get("exp", 0)) if "exp" in decoded else None
+                exp = self.decode_jwt_exp(token)
+                expiry_time = datetime.fromtimestamp(exp) if exp is not None else None
             except Exception:
                 pass  # If JWT decode fails, keep expiry_time as None
 
         await self.db.update_token(token_id, token=token, st=st, rt=rt, client_id=client_id, remark=remark, expiry_time=expiry_time,
                                    image_enabled=image_enabled, video_enabled=video_enabled,
                                    image_concurrency=image_concurrency, video_concurrency=video_concurrency)
+        self.invalidate_active_tokens_cache()
+
+    def invalidate_active_tokens_cache(self):
+        """Drop the cached active token list (call after any token write)"""
+        self._active_version += 1
+        self._active_cache = None
 
     async def get_active_tokens(self) -> List[Token]:
         """Get all active tokens (not cooled down)"""
-        return await self.db.get_active_tokens()
+        if self._active_cache is not None and time.time() < self._active_cache_expires_at:
+            return list(self._active_cache)
+
+        version = self._active_version
+        tokens = await self.db.get_active_tokens()
+        # Don't store a result that an invalidation raced with
+        if version == self._active_version:
+            self._active_cache = tokens
+            self._active_cache_expires_at = time.time() + self.ACTIVE_TOKENS_CACHE_TTL
+        return list(tokens)
     
     async def get_all_tokens(self) -> List[Token]:
         """Get all tokens"""
@@ -907,16 +1138,19 @@ class TokenManager:
     async def update_token_status(self, token_id: int, is_active: bool):
         """Update token active status"""
         await self.db.update_token_status(token_id, is_active)
+        self.invalidate_active_tokens_cache()
 
     async def enable_token(self, token_id: int):
         """Enable a token and reset error count"""
         await self.db.update_token_status(token_id, True)
+        self.invalidate_active_tokens_cache()
         # Reset error count when enabling (in token_stats table)
         await self.db.reset_error_count(token_id)
 
     async def disable_token(self, token_id: int):
         """Disable a token"""
         await self.db.update_token_status(token_id, False)
+        self.invalidate_active_tokens_cache()
 
     async def test_token(self, token_id: int) -> dict:
         """Test if a token is valid by calling Sora API and refresh Sora2 info"""
@@ -925,6 +1159,9 @@ class TokenManager:
         if not token_data:
             return {"valid": False, "message": "Token not found"}
 
+        # Always fetch fresh Sora2 info when testing
+        self.invalidate_enrichment_cache(token_data.token)
+
         try:
             # Try to get user info from Sora API
             user_info = await self.get_user_info(token_data.token)
@@ -944,7 +1181,7 @@ class TokenManager:
                     if remaining_info.get("success"):
                         sora2_remaining_count = remaining_info.get("remaining_count", 0)
                 except Exception as e:
-                    print(f"Failed to get Sora2 remaining count: {e}")
+                    debug_logger.log_info(f"[TEST_TOKEN] Failed to get Sora2 remaining count: {e}")
 
             # Update token Sora2 info in database
             await self.db.update_token_sora2(
@@ -955,6 +1192,7 @@ class TokenManager:
                 total_count=sora2_total_count,
                 remaining_count=sora2_remaining_count
             )
+            self.invalidate_active_tokens_cache()
 
             return {
                 "valid": True,
@@ -973,6 +1211,55 @@ class TokenManager:
                 "message": f"Token is invalid: {str(e)}"
             }
 
+    def get_runtime_stats(self, token_id: int) -> Optional[Dict[str, Any]]:
+        """Get in-memory load stats for a token (None if never used since startup)"""
+        return self._runtime_stats.get(token_id)
+
+    def begin_request(self, token_id: int, kind: str) -> Dict[str, Any]:
+        """Start tracking an in-flight request on a token for load-aware selection
+
+        Args:
+            token_id: Token ID
+            kind: Job kind ("image" or "video"); latency is tracked per kind since
+                a video job takes minutes and an image job tens of seconds
+
+        Returns a handle that must be passed to end_request exactly once
+        (call it from a finally block so aborted requests are released too).
+        """
+        stats = self._runtime_stats.setdefault(
+            token_id, {"latency": {"image": None, "video": None}, "inflight": 0, "fail": 0.0}
+        )
+        stats["inflight"] += 1
+        return {"token_id": token_id, "kind": kind, "started_at": time.time(), "done": False}
+
+    def end_request(self, handle: Dict[str, Any], success: Optional[bool]):
+        """Finish a request started with begin_request
+
+        Args:
+            handle: Handle returned by begin_request
+            success: True/False updates the kind's latency / failure EWMAs; None (aborted,
+                e.g. client disconnect) only releases the in-flight slot
+        """
+        if handle["done"]:
+            return
+        handle["done"] = True
+
+        stats = self._runtime_stats[handle["token_id"]]
+        stats["inflight"] = max(0, stats["inflight"] - 1)
+        if success is None:
+            return
+
+        alpha = self.STATS_EWMA_ALPHA
+        stats["fail"] = alpha * (0.0 if success else 1.0) + (1 - alpha) * stats["fail"]
+        if success:
+            kind = handle["kind"]
+            latency = time.time() - handle["started_at"]
+            previous = stats["latency"][kind]
+            if previous is None:
+                stats["latency"][kind] = latency
+            else:
+                stats["latency"][kind] = alpha * latency + (1 - alpha) * previous
+
     async def record_usage(self, token_id: int, is_video: bool = False):
         """Record token usage"""
         await self.db.update_token_usage(token_id)
@@ -982,6 +1269,17 @@ class TokenManager:
         else:
             await self.db.increment_image_count(token_id)
     
+    async def _get_admin_config(self) -> AdminConfig:
+        """Get admin config, cached for ADMIN_CONFIG_CACHE_TTL"""
+        if self._admin_cfg is None or time.time() - self._admin_cfg_ts > self.ADMIN_CONFIG_CACHE_TTL:
+            self._admin_cfg = await self.db.get_admin_config()
+            self._admin_cfg_ts = time.time()
+        return self._admin_cfg
+
+    def invalidate_admin_config_cache(self):
+        """Drop cached admin config (call after updating it)"""
+        self._admin_cfg = None
+
     async def record_error(self, token_id: int, is_overload: bool = False):
         """Record token error
 
@@ -989,15 +1287,15 @@ class TokenManager:
             token_id: Token ID
             is_overload: Whether this is an overload error (heavy_load). If True, only increment total error count.
         """
-        await self.db.increment_error_count(token_id, increment_consecutive=not is_overload)
+        consecutive_errors = await self.db.increment_error_count(token_id, increment_consecutive=not is_overload)
 
         # Check if should ban (only if not overload error)
         if not is_overload:
-            stats = await self.db.get_token_stats(token_id)
-            admin_config = await self.db.get_admin_config()
+            admin_config = await self._get_admin_config()
 
-            if stats and stats.consecutive_error_count >= admin_config.error_ban_threshold:
+            if consecutive_errors is not None and consecutive_errors >= admin_config.error_ban_threshold:
                 await self.db.update_token_status(token_id, False)
+                self.invalidate_active_tokens_cache()
     
     async def record_success(self, token_id: int, is_video: bool = False):
         """Record successful request (reset error count)"""
@@ -1012,7 +1310,8 @@ class TokenManager:
                     if remaining_info.get("success"):
                         remaining_count = remaining_info.get("remaining_count", 0)
                         await self.db.update_token_sora2_remaining(token_id, remaining_count)
-                        print(f"✅ 更新Token {token_id} 的Sora2剩余次数: {remaining_count}")
+                        self.invalidate_active_tokens_cache()
+                        debug_logger.log_info(f"[RECORD_SUCCESS] ✅ 更新Token {token_id} 的Sora2剩余次数: {remaining_count}")
 
                         # If remaining count is 0, set cooldown
                         if remaining_count == 0:
@@ -1020,9 +1319,10 @@ class TokenManager:
                             if reset_seconds > 0:
                                 cooldown_until = datetime.now() + timedelta(seconds=reset_seconds)
                                 await self.db.update_token_sora2_cooldown(token_id, cooldown_until)
-                                print(f"⏱️ Token {token_id} 剩余次数为0，设置冷却时间至: {cooldown_until}")
+                                self.invalidate_active_tokens_cache()
+                                debug_logger.log_info(f"[RECORD_SUCCESS] ⏱️ Token {token_id} 剩余次数为0，设置冷却时间至: {cooldown_until}")
             except Exception as e:
-                print(f"Failed to update Sora2 remaining count: {e}")
+                debug_logger.log_info(f"[RECORD_SUCCESS] Failed to update Sora2 remaining count: {e}")
     
     async def refresh_sora2_remaining_if_cooldown_expired(self, token_id: int):
         """Refresh Sora2 remaining count if cooldown has expired"""
@@ -1033,7 +1333,7 @@ class TokenManager:
 
             # Check if Sora2 cooldown has expired
             if token_data.sora2_cooldown_until and token_data.sora2_cooldown_until <= datetime.now():
-                print(f"🔄 Token {token_id} Sora2冷却已过期，正在刷新剩余次数...")
+                debug_logger.log_info(f"[SORA2_REFRESH] 🔄 Token {token_id} Sora2冷却已过期，正在刷新剩余次数...")
 
                 try:
                     remaining_info = await self.get_sora2_remaining_count(token_data.token)
@@ -1042,11 +1342,12 @@ class TokenManager:
                         await self.db.update_token_sora2_remaining(token_id, remaining_count)
                         # Clear cooldown
                         await self.db.update_token_sora2_cooldown(token_id, None)
-                        print(f"✅ Token {token_id} Sora2剩余次数已刷新: {remaining_count}")
+                        self.invalidate_active_tokens_cache()
+                        debug_logger.log_info(f"[SORA2_REFRESH] ✅ Token {token_id} Sora2剩余次数已刷新: {remaining_count}")
                 except Exception as e:
-                    print(f"Failed to refresh Sora2 remaining count: {e}")
+                    debug_logger.log_info(f"[SORA2_REFRESH] Failed to refresh Sora2 remaining count: {e}")
         except Exception as e:
-            print(f"Error in refresh_sora2_remaining_if_cooldown_expired: {e}")
+            debug_logger.log_info(f"[SORA2_REFRESH] Error in refresh_sora2_remaining_if_cooldown_expired: {e}")
 
     async def auto_refresh_expiring_token(self, token_id: int) -> bool:
         """